@@ -9,7 +9,7 @@ def write_pcap(filename, capture):
     Write a capture (eg. device.interface('0/0').capture) to a pcap file.
 
     :param filename: Where to write the pcap.
-    :param capture: List of netscool.layer1.Capture namedtuples.
+    :param capture: List of netscool.layer1.Capture objects.
     """
     with scapy.all.PcapWriter(filename) as writer:
         for cap in capture:
@@ -7,7 +7,8 @@ import logging
 import struct
 import threading
 import socket
-import select
+import selectors
+import itertools
 import collections
 
 import scapy.all
@@ -16,6 +17,20 @@ LINE_DOWN = 'down'
 LINE_UP = 'up'
 LINE_ADMIN_DOWN = 'admin down'
 
+# Loggers are looked up once here rather than on every call, and log
+# messages use lazy %-style arguments so no string formatting happens
+# for frames when the logger is not enabled.
+_device_status_logger = logging.getLogger('netscool.layer1.device.status')
+_interface_status_logger = logging.getLogger(
+    'netscool.layer1.interface.status')
+_interface_receive_logger = logging.getLogger(
+    'netscool.layer1.interface.receive')
+_interface_send_logger = logging.getLogger('netscool.layer1.interface.send')
+_cable_logger = logging.getLogger('netscool.layer1.cable')
+
+# Parent of all netscool loggers, used to check if logs are enabled at all.
+_netscool_logger = logging.getLogger('netscool')
+
 class BaseDevice():
     """
     Base device base class that has a name and a list of interfaces.
@@ -23,7 +38,9 @@ class BaseDevice():
     method for device specific behaviour.
     """
 
-    # We have a lock shared between all devices so that each iteration
+    # Device event loops run concurrently, and each interface guards its
+    # own send buffer (see BaseInterface). When info logs are enabled we
+    # also have a lock shared between all devices so that each iteration
     # of a devices event loop cannot be interrupted by another device.
     # This makes reading logs and debugging easier because they cant
     # interleave.
@@ -33,7 +50,7 @@ class BaseDevice():
     # a device to crash (and probably numerous other race conditions).
     # This requires some serious thought to fix and has so far not
     # been an issue in practice, so im kicking the can down the road.
-    _lock = threading.Lock()
+    _log_lock = threading.Lock()
     def __init__(self, name, interfaces):
         self._shutdown_event = threading.Event()
         self._thread = None
@@ -41,6 +58,22 @@ class BaseDevice():
         self.name = name
         self._event_loop_exception = None
 
+        # Written to whenever there is new data for the device to handle,
+        # so the event loop can run again straight away instead of
+        # waiting out the rest of its update interval. This is a socket
+        # pair rather than a threading.Event so the device can wait on it
+        # together with the sockets of any SocketCables. Each interface
+        # is given _wake() so it can wake the device it belongs to. The
+        # sockets only exist while the device is started, see
+        # _open_wake_sockets().
+        self._wake_socket = None
+        self._wake_notify_socket = None
+        self._wake_pending = False
+        self._selector = None
+        self._wait_sockets = set()
+        for interface in self.interfaces:
+            interface._device_wake = self._wake
+
     @property
     def event_loop_exception(self):
         return self._event_loop_exception
@@ -91,6 +124,7 @@ class BaseDevice():
 
         # Set the shutdown event and wait for the thread to join.
         self._shutdown_event.set()
+        self._wake()
         self._thread.join()
         self._thread = None
         self._internal_shutdown()
@@ -102,11 +136,12 @@ class BaseDevice():
             interface.powered = False
             interface.negotiate_connection()
 
+        self._close_wake_sockets()
+
         # Reset the shutdown event so the device can be started again.
         self._shutdown_event.clear()
 
-        logger = logging.getLogger('netscool.layer1.device.status')
-        logger.info("{} shutdown".format(self))
+        _device_status_logger.info("%s shutdown", self)
 
     def start(self):
         """
@@ -118,8 +153,15 @@ class BaseDevice():
         if self._thread and self._thread.is_alive():
             return
 
-        logger = logging.getLogger('netscool.layer1.device.status')
-        logger.info("{} start".format(self))
+        _device_status_logger.info("%s start", self)
+        self._open_wake_sockets()
+
+        # Power on all interfaces so they can negotiate link and
+        # protocol status. This is done before the thread starts so that
+        # if the event loop fails straight away, its shutdown powers the
+        # interfaces off again after this rather than before.
+        for interface in self.interfaces:
+            interface.powered = True
 
         # Start the _run method which handles the shutdown event, and
         # repeatedly calls event_loop().
@@ -127,11 +169,6 @@ class BaseDevice():
             target=self._run, name=self.name)
         self._thread.start()
 
-        # Power on all interfaces so they can negotiate link and
-        # protocol status.
-        for interface in self.interfaces:
-            interface.powered = True
-
     def event_loop(self):
         """
         Event loop for device. This is the only method that needs to be
@@ -149,34 +186,260 @@ class BaseDevice():
         self._event_loop_exception = None
         try:
             while not self._shutdown_event.is_set():
-                with BaseDevice._lock:
-                    # Something needs to trigger the cables plugged into
-                    # the interfaces to actually transfer. Instead of
-                    # making each cable its own thread, we just update all
-                    # the attached cables here.
-                    for interface in self.interfaces:
-                        interface.update()
-                        if not interface.cable:
-                            continue
-                        interface.cable.update()
-
-                    self.event_loop()
-                time.sleep(0.1)
+                if _netscool_logger.isEnabledFor(logging.INFO):
+                    with BaseDevice._log_lock:
+                        busy = self._update()
+                else:
+                    busy = self._update()
+
+                # The event loop is still working through received data
+                # so go straight to the next iteration.
+                if busy:
+                    continue
+
+                # Wait until there is new data to handle, or at most 0.1
+                # seconds so cables and timers still update when idle.
+                self._wait(0.1)
         except Exception as e:
-            logging.exception("Error in {} event loop".format(self.name))
+            logging.exception("Error in %s event loop", self.name)
             self._event_loop_exception = e
         finally:
             self._shutdown_event.set()
             self._internal_shutdown()
 
+    def _update(self):
+        """
+        A single iteration of the device, updates interfaces and cables
+        then runs event_loop().
+
+        :returns: True if event_loop() handled received data and there is
+            more received data waiting to be handled.
+        """
+        # Something needs to trigger the cables plugged into the
+        # interfaces to actually transfer. Instead of making each cable
+        # its own thread, we just update all the attached cables here.
+        # A cable updates both its ends, so a cable plugged into two of
+        # our interfaces only needs updating once.
+        updated_cables = []
+        for interface in self.interfaces:
+            interface.update()
+            cable = interface.cable
+            if not cable or cable in updated_cables:
+                continue
+            cable.update()
+            updated_cables.append(cable)
+
+        # Most event loops only handle one received data per interface
+        # each iteration. Checking if the event loop is still getting
+        # through the receive buffers lets a burst of data be handled
+        # back to back. Data that isnt being received eg. the interface
+        # is down, doesnt count so we dont spin waiting on it.
+        pending = self._recv_pending()
+        self.event_loop()
+        remaining = self._recv_pending()
+        return 0 < remaining < pending
+
+    def _recv_pending(self):
+        """
+        Total amount of received data waiting in interface receive
+        buffers.
+        """
+        return sum(
+            len(interface.recv_buffer) for interface in self.interfaces)
+
+    def _wake(self):
+        """
+        Wake the device so its event loop runs again without waiting for
+        the rest of its update interval.
+        """
+        # Only need to write to the wake socket once until the device
+        # has woken up.
+        if self._wake_pending:
+            return
+
+        # The device isnt started so there is nothing to wake.
+        wake_notify_socket = self._wake_notify_socket
+        if wake_notify_socket is None:
+            return
+
+        self._wake_pending = True
+        try:
+            wake_notify_socket.send(b'\0')
+        except BlockingIOError:
+            # The wake socket is full, so the device will wake anyway.
+            pass
+        except OSError:
+            # The device shutdown and closed the socket since we checked.
+            pass
+
+    def _wait(self, timeout):
+        """
+        Wait until the device is woken, data arrives on the socket of a
+        cable plugged into one of our interfaces, or ``timeout`` seconds
+        have passed.
+
+        :param timeout: Maximum time to wait in seconds.
+        """
+        # Cables can be plugged, unplugged and powered while the device
+        # runs, so only register and unregister the cable sockets that
+        # have changed since we last waited.
+        wait_sockets = set()
+        for interface in self.interfaces:
+            if not interface.cable:
+                continue
+            wait_socket = interface.cable.wait_socket
+            if wait_socket is not None:
+                wait_sockets.add(wait_socket)
+
+        selector = self._selector
+        for wait_socket in self._wait_sockets - wait_sockets:
+            selector.unregister(wait_socket)
+        for wait_socket in wait_sockets - self._wait_sockets:
+            selector.register(wait_socket, selectors.EVENT_READ)
+        self._wait_sockets = wait_sockets
+
+        selector.select(timeout)
+
+        # Clear the wake socket before allowing wakes again. If the flag
+        # was reset first, a wake in between would have its byte drained
+        # here while leaving the flag set, and every later wake would be
+        # skipped. A wake after the drain but before the flag is reset is
+        # skipped, but the event loop always runs after we return so
+        # whatever it was for still gets handled.
+        try:
+            while self._wake_socket.recv(1024):
+                pass
+        except BlockingIOError:
+            pass
+        self._wake_pending = False
+
+    def _open_wake_sockets(self):
+        """
+        Create the socket pair used to wake the device, see _wake(), and
+        the selector _wait() waits on. A selector rather than
+        select.select() means there is no limit on the file descriptor
+        numbers of the sockets, however many devices a process has.
+        """
+        self._close_wake_sockets()
+        self._wake_socket, self._wake_notify_socket = socket.socketpair()
+        self._wake_socket.setblocking(False)
+        self._wake_notify_socket.setblocking(False)
+        self._wake_pending = False
+
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._wake_socket, selectors.EVENT_READ)
+
+        # Cable sockets currently registered with the selector.
+        self._wait_sockets = set()
+
+    def _close_wake_sockets(self):
+        """
+        Close the socket pair used to wake the device, and the selector,
+        if they are open.
+        """
+        selector = self._selector
+        wake_socket = self._wake_socket
+        wake_notify_socket = self._wake_notify_socket
+        self._selector = None
+        self._wait_sockets = set()
+        self._wake_socket = None
+        self._wake_notify_socket = None
+        if selector is not None:
+            selector.close()
+        if wake_socket is not None:
+            wake_socket.close()
+        if wake_notify_socket is not None:
+            wake_notify_socket.close()
+
     def __str__(self):
         return self.name
 
 MAX_CAPTURE = 100
 DIR_IN = "IN"
 DIR_OUT = "OUT"
-Capture = collections.namedtuple(
-    "Capture", ["time", "direction", "data"])
+# Layers that captured() will attempt to dissect a capture into, in the
+# order they are expected to appear in a frame. The index lets us find
+# how deep we need to dissect for a given search type.
+_CAPTURE_LAYERS = (scapy.all.Ether, scapy.all.Dot1Q, scapy.all.IP)
+_CAPTURE_LAYER_INDEX = {
+    layer: index for index, layer in enumerate(_CAPTURE_LAYERS)}
+
+# Minimum header size for each capture layer. Anything shorter cant be
+# dissected as that layer so we dont bother trying.
+_CAPTURE_LAYER_MIN_LEN = {
+    scapy.all.Ether: 14,
+    scapy.all.Dot1Q: 4,
+    scapy.all.IP: 20,
+}
+
+class Capture():
+    """
+    Data captured going in or out of an interface.
+    """
+    __slots__ = (
+        'time', 'direction', 'data', 'payload', 'layers', '_layer_bytes')
+
+    def __init__(self, time, direction, data):
+        """
+        :param time: Time the data was captured.
+        :param direction: DIR_IN or DIR_OUT.
+        :param data: The captured bytes.
+        """
+        self.time = time
+        self.direction = direction
+        self.data = data
+
+        # Data with the 4 byte FCS appended to frames stripped off. This
+        # is only visible on captures coming out of the interface. A
+        # memoryview avoids copying the data for captures that are never
+        # searched.
+        self.payload = memoryview(data)
+        if direction == DIR_OUT:
+            self.payload = self.payload[:-4]
+
+        # Scapy layers dissected from payload, one per _CAPTURE_LAYERS, or
+        # None if payload couldnt be dissected as that layer. These are
+        # only dissected as needed and kept so searching the same capture
+        # again doesnt have to dissect it again.
+        self.layers = []
+        self._layer_bytes = None
+
+    def dissect(self, depth):
+        """
+        Dissect captured payload into the first ``depth`` capture layers.
+
+        :param depth: Number of layers in _CAPTURE_LAYERS to dissect.
+        :returns: List of dissected layers.
+        """
+        # Scapy can only dissect bytes, so this is the one place the
+        # payload is copied.
+        if self._layer_bytes is None:
+            self._layer_bytes = bytes(self.payload)
+
+        for layer in _CAPTURE_LAYERS[len(self.layers):depth]:
+            capture_obj = None
+
+            # Only attempt to convert bytes to this layer if there are
+            # enough bytes for its header. The payload keeps the raw bytes
+            # it was dissected from, so use those rather than serialising
+            # the payload again.
+            if len(self._layer_bytes) >= _CAPTURE_LAYER_MIN_LEN[layer]:
+                try:
+                    capture_obj = layer(self._layer_bytes)
+                    self._layer_bytes = getattr(
+                        capture_obj.payload, 'original', b'')
+
+                # Converting to this layer didnt work so the next layer
+                # gets the same bytes.
+                except (struct.error, IndexError):
+                    capture_obj = None
+
+            self.layers.append(capture_obj)
+        return self.layers
+
+    def __repr__(self):
+        return "Capture(time={!r}, direction={!r}, data={!r})".format(
+            self.time, self.direction, self.data)
 
 class BaseInterface():
     """
@@ -188,10 +451,18 @@ class BaseInterface():
         self.name = name
 
         self.cable = None
-        self.recv_buffer = []
-        self.send_buffer = []
+        self.recv_buffer = collections.deque()
+        self.send_buffer = collections.deque()
         self._powered = False
 
+        # Devices at each end of a cable run in different threads, so
+        # anything that drains the send buffer or needs to see exactly
+        # what was added to it must hold this lock.
+        self._send_lock = threading.Lock()
+
+        # Set by the device this interface belongs to, see wake_device().
+        self._device_wake = None
+
         self._capture = []
 
         # Replace send and receive with wrappers that capture data
@@ -225,46 +496,34 @@ class BaseInterface():
                 return True
             return False
 
+        # Work out which layer we need to dissect to reach the layer
+        # being searched for. If the search isnt bytes or a layer we know
+        # how to dissect then it can never match a capture.
+        search_type = type(search)
+        if search_type != bytes:
+            index = _CAPTURE_LAYER_INDEX.get(search_type)
+            if index is None:
+                return False
+
         for capture in self._capture:
-            capture_bytes = capture.data
 
             # Bytes passed in so check bytes match exactly.
-            if type(search) == type(capture_bytes):
-                if (search == capture_bytes and
+            if search_type == bytes:
+                if (search == capture.data and
                     check_direction(direction, capture)):
                     return True
                 continue
 
-            # Strip off 4 byte FCS appended to frames. This is only
-            # visible on captures coming out of the interface.
-            if capture.direction == DIR_OUT:
-                capture_bytes = capture_bytes[:-4]
-
-            for layer in [scapy.all.Ether, scapy.all.Dot1Q, scapy.all.IP]:
-                
-                # Attempt to convert bytes to next layer.
-                try:
-                    capture_obj = layer(capture_bytes)
-                    capture_bytes = bytes(capture_obj.payload)
-
-                # Converting to this layer didnt work so move onto the
-                # next layer.
-                except:
-                    capture_obj = None
-                    continue
-
-                # The type of this layer was passed in so check if it
-                # matches.
-                if type(search) == type(capture_obj):
-
-                    # This capture matches, so we're done!
-                    if (search == capture_obj and
-                        check_direction(direction, capture)):
-                        return True
+            # Check if the layer of the type passed in matches. If the
+            # capture couldnt be dissected as that layer it cant match.
+            capture_obj = capture.dissect(index + 1)[index]
+            if capture_obj is None:
+                continue
 
-                    # didnt match so no point comparing against this
-                    # capture anymore.
-                    break
+            # This capture matches, so we're done!
+            if (search == capture_obj and
+                check_direction(direction, capture)):
+                return True
 
         return False
 
@@ -291,13 +550,23 @@ class BaseInterface():
         """
         data = self._real_receive(*args, **kwargs)
         if data != None:
-            capture = Capture(
-                time=time.time(), direction=DIR_IN,
-                data=bytes(data))
-            self._capture.append(capture)
-            self._capture = self._capture[-MAX_CAPTURE:]
+            self._capture_received(data)
         return data
 
+    def _capture_received(self, data):
+        """
+        Capture data the interface received. Used by _capture_receive(),
+        and by devices that receive data without going through
+        receive().
+
+        :param data: The received data.
+        """
+        capture = Capture(
+            time=time.time(), direction=DIR_IN,
+            data=bytes(data))
+        self._capture.append(capture)
+        self._capture = self._capture[-MAX_CAPTURE:]
+
     def _capture_send(self, *args, **kwargs):
         """
         Capture any data the interface sends. The captured data will only
@@ -305,21 +574,21 @@ class BaseInterface():
         inherited interface drops the data it will not be captured. Only
         keeps the last MAX_CAPTURES worth of messages.
         """
-        # We check the send buffer before and after the send. Anything
-        # new in the send buffer is data that has been successfully sent.
-        # There is a small race condition that the send buffer will be
-        # drained between _real_send and assigning post_buffer. If this
-        # becomes a recurring issue i'll add some locks around the
-        # send_buffer.
-        pre_buffer = set(self.send_buffer)
-        self._real_send(*args, **kwargs)
-        post_buffer = set(self.send_buffer)
+        # Send only ever appends to the send buffer, so anything past the
+        # length of the buffer before the send is data that has been
+        # successfully sent. Holding the send lock stops a cable draining
+        # the buffer in between.
+        with self._send_lock:
+            pre_len = len(self.send_buffer)
+            self._real_send(*args, **kwargs)
+            sent = list(
+                itertools.islice(self.send_buffer, pre_len, None))
 
         capture = [
             Capture(
                 time=time.time(), direction=DIR_OUT,
                 data=bytes(data))
-            for data in post_buffer - pre_buffer]
+            for data in sent]
 
         self._capture += capture
         self._capture = self._capture[-MAX_CAPTURE:]
@@ -334,10 +603,18 @@ class BaseInterface():
         Powers the interface on or off (True/False). Also attempts to
         power the cable if one is plugged into the interface.
         """
-        assert val in [True, False], (
+        assert val == True or val == False, (
             "Interface powered can only be True | False.")
         self._powered = val
 
+    def wake_device(self):
+        """
+        Wake the device this interface belongs to, so it handles new data
+        without waiting for its next regular update.
+        """
+        if self._device_wake is not None:
+            self._device_wake()
+
     def plug_cable(self, cable):
         """
         Plug a cable into the interface.
@@ -388,8 +665,7 @@ class L1Interface(BaseInterface):
 
     def shutdown(self):
         """ Administratively shutdown the interface. """
-        logger = logging.getLogger('netscool.layer1.interface.status')
-        logger.info("{} shutdown".format(self))
+        _interface_status_logger.info("%s shutdown", self)
         self.line_status = LINE_ADMIN_DOWN
 
     def no_shutdown(self):
@@ -398,8 +674,7 @@ class L1Interface(BaseInterface):
         many devices a command can be negated by prepending 'no'. So to
         enable an interface you use the command 'no shutdown'.
         """
-        logger = logging.getLogger('netscool.layer1.interface.status')
-        logger.info("{} no shutdown".format(self))
+        _interface_status_logger.info("%s no shutdown", self)
 
         # We can set the line status to anything that isnt
         # 'LINE_ADMIN_DOWN' and update() should re-negotiate the line
@@ -410,48 +685,46 @@ class L1Interface(BaseInterface):
         """
         Get the next frame from the interface's receive buffer.
         """
-        logger = logging.getLogger('netscool.layer1.interface.receive')
         if not self.line_up:
             return
         if not self.recv_buffer:
             return
 
-        logger.info("{} received layer1 data".format(self))
-        return self.recv_buffer.pop(0)
+        _interface_receive_logger.info("%s received layer1 data", self)
+        return self.recv_buffer.popleft()
         
     def send(self, data):
         """
         Put data in the interface's send buffer.
         """
-        logger = logging.getLogger('netscool.layer1.interface.send')
         if not self.line_up:
-            logger.error(
-                "{} cannot send data. Line is down".format(self))
+            _interface_send_logger.error(
+                "%s cannot send data. Line is down", self)
             return
 
-        logger.info("{} sending layer1 data".format(self))
+        _interface_send_logger.info("%s sending layer1 data", self)
         self.send_buffer.append(data)
+        self.wake_device()
 
     def negotiate_connection(self):
         """
         Negotiate connectivity for this layer. At layer 1 this is usually
         referred to as 'line' connectivity.
         """
-        logger = logging.getLogger('netscool.layer1.interface.status')
         if not self.powered:
             if self.line_status == LINE_UP:
-                logger.info("{} line down".format(self))
+                _interface_status_logger.info("%s line down", self)
                 self.line_status = LINE_DOWN
             return
 
         if not self.cable or not self.cable.active:
             if self.line_status == LINE_UP:
-                logger.info("{} line down".format(self))
+                _interface_status_logger.info("%s line down", self)
                 self.line_status = LINE_DOWN
 
         elif self.cable.active:
             if self.line_status == LINE_DOWN:
-                logger.info("{} line up".format(self))
+                _interface_status_logger.info("%s line up", self)
                 self.line_status = LINE_UP
 
 class BaseCable():
@@ -460,6 +733,8 @@ class BaseCable():
     is just a class that transfers bytes from one interface to another
     interface.
     """
+    __slots__ = ('_active',)
+
     def __init__(self):
         self._active = False
 
@@ -471,6 +746,14 @@ class BaseCable():
         """
         return self._active
 
+    @property
+    def wait_socket(self):
+        """
+        Socket that a device waits on for data arriving on this cable,
+        or None if the cable has no socket to wait on.
+        """
+        return None
+
     def update(self):
         """
         Called at regular intervals when plugged into an interface
@@ -498,6 +781,8 @@ class Cable(BaseCable):
     transfers data from the send buffer of each interface to the receive
     buffer of the other interface.
     """
+    __slots__ = ('end1', 'end2')
+
     def __init__(self):
         super().__init__()
         self.end1 = None
@@ -514,35 +799,56 @@ class Cable(BaseCable):
         data in the recv_buffer of the opposite interface. Throws an
         error if the data is not bytes.
         """
-        logger = logging.getLogger('netscool.layer1.cable')
-        if not self.end1 or not self.end2:
+        # Take the ends once so the checks and transfer all see the same
+        # ends, even if one is unplugged part way through the update.
+        end1 = self.end1
+        end2 = self.end2
+        if not end1 or not end2:
             self._active = False
             return
 
-        if LINE_ADMIN_DOWN in [self.end1.line_status, self.end2.line_status]:
+        if (end1.line_status == LINE_ADMIN_DOWN or
+            end2.line_status == LINE_ADMIN_DOWN):
             self._active = False
             return
 
-        if not self.end1.powered or not self.end2.powered:
+        if not end1.powered or not end2.powered:
             self._active = False
             return
 
         self._active = True
-        while self.end1.send_buffer:
-            data = self.end1.send_buffer.pop(0)
-            assert type(data) == bytes
-            logger.info(
-                "Cable transfer data {} -> {}".format(
-                    self.end1.name, self.end2.name))
-            self.end2.recv_buffer.append(data)
-
-        while self.end2.send_buffer:
-            data = self.end2.send_buffer.pop(0)
-            assert type(data) == bytes
-            logger.info(
-                "Cable transfer data {} -> {}".format(
-                    self.end2.name, self.end1.name))
-            self.end1.recv_buffer.append(data)
+        self._transfer(end1, end2)
+        self._transfer(end2, end1)
+
+    def _transfer(self, src, dst):
+        """
+        Drain the send buffer of the ``src`` interface into the receive
+        buffer of the ``dst`` interface.
+        """
+        # The devices at both ends update this cable, so hold the send
+        # lock until the data is in the receive buffer, otherwise two
+        # transfers could reach dst out of order. Data is popped rather
+        # than copying and clearing the buffer, so anything appended
+        # without the lock cant be lost, then added to the receive buffer
+        # in one go.
+        with src._send_lock:
+            send_buffer = src.send_buffer
+            transfer = []
+            while send_buffer:
+                transfer.append(send_buffer.popleft())
+            # Sanity check each data, skipped entirely under python -O.
+            if __debug__:
+                for data in transfer:
+                    assert type(data) == bytes, "Cable data must be bytes"
+            dst.recv_buffer.extend(transfer)
+
+        # Log once per transfer rather than once per data, so a busy
+        # cable doesnt flood the logs.
+        if transfer:
+            _cable_logger.info(
+                "Cable transfer %d data %s -> %s",
+                len(transfer), src.name, dst.name)
+            dst.wake_device()
 
     def plugin(self, interface):
         """
@@ -578,6 +884,9 @@ class Cable(BaseCable):
         self.update()
 
 SOCKET_CABLE_HEARTBEAT = b'\0'
+
+# Largest payload a UDP datagram over IPv4 can carry.
+_MAX_UDP_PAYLOAD = 65507
 class SocketCable(BaseCable):
     """
     A cable that connects via a UDP socket. The intention is that the
@@ -592,6 +901,11 @@ class SocketCable(BaseCable):
     This enables us to connect our device to an example device running
     in another python process.
     """
+    __slots__ = (
+        'end', 'socket', 'mtu', '_host', '_src_port', '_dst_port',
+        '_last_heartbeat', '_heartbeat_timeout', '_last_heartbeat_sent',
+        '_heartbeat_interval', '_socket_buffer')
+
     def __init__(self, src_port, dst_port):
         """
         Create one 'end' of the cable. Two ends of the cable should have
@@ -613,27 +927,54 @@ class SocketCable(BaseCable):
         self._host = '127.0.0.1'
         self._src_port = src_port
         self._dst_port = dst_port
-        self._last_heartbeat = time.time()
+        # Heartbeat times are from time.monotonic() so they arent affected
+        # by changes to the system clock.
+        self._last_heartbeat = time.monotonic()
         self._heartbeat_timeout = 1
 
+        # Devices wake up when data arrives on the socket, so heartbeats
+        # are only sent every heartbeat interval. Otherwise the
+        # heartbeats from each end would keep waking each other up.
+        self._heartbeat_interval = 0.1
+        self._last_heartbeat_sent = (
+            self._last_heartbeat - self._heartbeat_interval)
+
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.mtu = 1500
         self.socket.bind((self._host, self._src_port))
 
+        # Connecting the socket means the destination address doesnt have
+        # to be parsed on every send, and we only receive datagrams from
+        # the other end of the cable.
+        self.socket.connect((self._host, self._dst_port))
+
+        # Datagrams are read into this buffer and only the received bytes
+        # are copied out, rather than allocating a full sized buffer for
+        # every datagram. The copy is needed because the data is kept in
+        # the interface receive buffer. The buffer fits the largest UDP
+        # payload, so datagrams are never truncated whatever mtu the
+        # interfaces at either end use.
+        self._socket_buffer = memoryview(bytearray(_MAX_UDP_PAYLOAD))
+
+        # The socket is non blocking so update() can drain everything
+        # that has arrived since the last update without waiting on the
+        # socket between each datagram.
+        self.socket.setblocking(False)
+
     def update(self):
         """
         Cable becomes active if.
          - An interface is plugged into this cable end.
          - The attached interface is powered.
          - The attached interface is not 'admin down'.
-         - We have received a heartbeat message from the other end within
+         - We have received a heartbeat or data from the other end within
            the last second.
 
         When active sends everything in the interface send buffer down
-        the src UDP socket (and a heartbeat), and reads anything sent
-        to the UDP socket and puts it in the interface recv buffer.
+        the src UDP socket (or a heartbeat if there is nothing to send),
+        and reads anything sent to the UDP socket and puts it in the
+        interface recv buffer.
         """
-        logger = logging.getLogger('netscool.layer1.cable')
         if not self.end:
             self._active = False
             return
@@ -646,26 +987,62 @@ class SocketCable(BaseCable):
             self._active = False
             return
 
-        self._transmit(SOCKET_CABLE_HEARTBEAT)
-        while self.end.send_buffer:
-            logger.info(
-                "Cable sending data from {}".format(self.end.name))
-            self._transmit(self.end.send_buffer.pop(0))
-
-        recv = self._receive()
-        while recv:
-            if recv == SOCKET_CABLE_HEARTBEAT:
-                self._active = True
-                self._last_heartbeat = time.time()
-            else:
-                logger.info(
-                    "Cable recieved data to {} ".format(self.end.name))
-                self.end.recv_buffer.append(recv)
-            recv = self._receive()
-
-        if time.time() - self._last_heartbeat > self._heartbeat_timeout:
+        # The update is quick enough that one time is good enough for
+        # everything we do in it.
+        now = time.monotonic()
+
+        # Only hold the send lock while taking data off the send buffer,
+        # not while waiting on the socket to send it. Data is popped for
+        # the same reason as Cable._transfer().
+        with self.end._send_lock:
+            send_buffer = self.end.send_buffer
+            datagrams = []
+            while send_buffer:
+                datagrams.append(send_buffer.popleft())
+
+        # Any datagram tells the other end we are still here, so a
+        # heartbeat only needs to be sent when there is no data to send.
+        if datagrams:
+            _cable_logger.info(
+                "Cable sending %d data from %s",
+                len(datagrams), self.end.name)
+            self._last_heartbeat_sent = now
+        elif now - self._last_heartbeat_sent >= self._heartbeat_interval:
+            datagrams.append(SOCKET_CABLE_HEARTBEAT)
+            self._last_heartbeat_sent = now
+        self._transmit(datagrams)
+
+        # Likewise anything received from the other end, not only
+        # heartbeats, means the other end is still there.
+        received = self._receive()
+        if received:
+            self._active = True
+            self._last_heartbeat = now
+
+        received = [
+            recv for recv in received if recv != SOCKET_CABLE_HEARTBEAT]
+        if received:
+            _cable_logger.info(
+                "Cable recieved %d data to %s", len(received), self.end.name)
+            self.end.recv_buffer.extend(received)
+
+        if now - self._last_heartbeat > self._heartbeat_timeout:
             self._active = False
 
+    @property
+    def wait_socket(self):
+        """
+        The UDP socket, if update() will read from it. Data is only read
+        when plugged into an interface that is powered and not 'admin
+        down', otherwise waiting on the socket would keep waking the
+        device without the data ever being read.
+        """
+        if not self.end or not self.end.powered:
+            return None
+        if self.end.line_status == LINE_ADMIN_DOWN:
+            return None
+        return self.socket
+
     def plugin(self, interface):
         """
         Plug interface into this end of the socket cable. Will fail if
@@ -691,13 +1068,37 @@ class SocketCable(BaseCable):
         self.end = None
         self.update()
 
-    def _transmit(self, data):
-        assert len(data) <= self.mtu
-        self.socket.sendto(data, (self._host, self._dst_port))
+    def _transmit(self, datagrams):
+        # There is no portable way to send several datagrams with one
+        # syscall, so keep the per datagram work down to a single send.
+        # Sanity check each datagram, skipped entirely under python -O.
+        if __debug__:
+            for data in datagrams:
+                assert len(data) <= self.mtu, "Datagram bigger than mtu"
+        send = self.socket.send
+        for data in datagrams:
+            try:
+                send(data)
+            except ConnectionRefusedError:
+                # The other end of the cable isnt listening (yet), so
+                # the data is lost as if the cable was unplugged.
+                pass
 
     def _receive(self):
-        read_fds, _, _ = select.select([self.socket], [], [], 0.1)
-        if not read_fds or read_fds[0] != self.socket:
-            return None
-        data, addr = self.socket.recvfrom(self.mtu)
-        return data
+        # Read everything that has arrived on the socket since the last
+        # update in one go.
+        recv_into = self.socket.recv_into
+        buffer = self._socket_buffer
+        datagrams = []
+        while True:
+            try:
+                nbytes = recv_into(buffer)
+            except BlockingIOError:
+                # Nothing left to read from the socket.
+                break
+            except ConnectionRefusedError:
+                # A previous send was refused because the other end
+                # isnt listening, there may still be more to read.
+                continue
+            datagrams.append(bytes(buffer[:nbytes]))
+        return datagrams
@@ -2,8 +2,8 @@
 Contains classes and methods that operate at Layer 2.
 """
 
-import copy
 import time
+import struct
 import logging
 import collections
 
@@ -12,21 +12,46 @@ import scapy.all
 import netscool
 import netscool.layer1
 
+# Module loggers, see netscool.layer1 for why.
+_device_receive_logger = logging.getLogger('netscool.layer2.device.receive')
+_interface_status_logger = logging.getLogger(
+    'netscool.layer2.interface.status')
+_interface_receive_logger = logging.getLogger(
+    'netscool.layer2.interface.receive')
+_interface_send_logger = logging.getLogger('netscool.layer2.interface.send')
+_switch_cam_logger = logging.getLogger('netscool.layer2.switch.cam')
+_switch_receive_logger = logging.getLogger('netscool.layer2.switch.receive')
+_switch_port_logger = logging.getLogger('netscool.layer2.switch.port')
+
+# Looked up once so code run for every frame doesnt have to go through
+# the scapy.all module each time. Dot1Q tags are handled on the raw
+# frame bytes so only Ether is needed.
+_Ether = scapy.all.Ether
+
+_BROADCAST_MAC = b'\xff\xff\xff\xff\xff\xff'
+
 class L2Device(netscool.layer1.BaseDevice):
     """
     A basic layer 2 device that just logs any frame it receives.
     """
     def event_loop(self):
         """ Log each frame the device receives. """
-        logger = logging.getLogger("netscool.layer2.device.receive")
         for interface in self.interfaces:
 
+            # Skip interfaces with nothing to receive without going
+            # through the whole receive() call chain.
+            if not interface.recv_buffer:
+                continue
+
             frame = interface.receive()
             if not frame:
                 continue
 
-            logger.info(
-                '{} got frame\n{}'.format(self, frame.show(dump=True)))
+            # Dumping the frame walks every field of every layer, so only
+            # do it if the log is actually going to be written.
+            if _device_receive_logger.isEnabledFor(logging.INFO):
+                _device_receive_logger.info(
+                    '%s got frame\n%s', self, frame.show(dump=True))
 
 class L2Interface(netscool.layer1.L1Interface):
     """ A Layer 2 interface. """
@@ -34,6 +59,12 @@ class L2Interface(netscool.layer1.L1Interface):
     PROTOCOL_DOWN = 'down'
     PROTOCOL_UP = 'up'
     PROTOCOL_ERR = 'down err'
+
+    # Called with no arguments whenever the line or protocol status
+    # changes, so upup may have changed. Set by a Switch to keep track of
+    # which of its interfaces are up/up, see Switch._flood().
+    _status_changed = None
+
     def __init__(self, name, mac, bandwidth=1000, mtu=1500, promiscuous=False):
         """
         :param name: Name of interface to make identification simpler.
@@ -64,6 +95,42 @@ class L2Interface(netscool.layer1.L1Interface):
         # frame_check_sequence(4 bytes) = 6 + 6 + 2 + 4 = 18.
         self.maximum_frame_size = mtu + 18
 
+    @property
+    def mac(self):
+        """ Layer2 MAC address for interface. """
+        return self._mac
+
+    @mac.setter
+    def mac(self, val):
+        # Keep a lowercase copy of the MAC, and the MAC as bytes, to
+        # compare received frames against, so we dont have to convert it
+        # for every frame.
+        self._mac = val
+        self._mac_lower = val.lower()
+        self._mac_bytes = _mac_to_bytes(val)
+
+    @property
+    def line_status(self):
+        """ Layer 1 line status for interface. """
+        return self._line_status
+
+    @line_status.setter
+    def line_status(self, val):
+        self._line_status = val
+        if self._status_changed is not None:
+            self._status_changed()
+
+    @property
+    def protocol_status(self):
+        """ Layer 2 protocol status for interface. """
+        return self._protocol_status
+
+    @protocol_status.setter
+    def protocol_status(self, val):
+        self._protocol_status = val
+        if self._status_changed is not None:
+            self._status_changed()
+
     @property
     def upup(self):
         """
@@ -95,16 +162,15 @@ class L2Interface(netscool.layer1.L1Interface):
         not apply.
         """
         super().negotiate_connection()
-        logger = logging.getLogger('netscool.layer2.interface.status')
         if self.line_up:
             if self.protocol_status == L2Interface.PROTOCOL_DOWN:
-                logger.info(
-                    "{} line protocol up".format(self, self.mac))
+                _interface_status_logger.info(
+                    "%s line protocol up", self)
                 self.protocol_status = L2Interface.PROTOCOL_UP
         else:
             if self.protocol_status == L2Interface.PROTOCOL_UP:
-                logger.info(
-                    "{} line protocol down".format(self, self.mac))
+                _interface_status_logger.info(
+                    "%s line protocol down", self)
                 self.protocol_status = L2Interface.PROTOCOL_DOWN
 
     def receive(self):
@@ -113,7 +179,22 @@ class L2Interface(netscool.layer1.L1Interface):
 
         :returns: Scapy Ether object of frame or None.
         """
-        logger = logging.getLogger('netscool.layer2.interface.receive')
+        data = self._receive_frame_data()
+        if not data:
+            return
+
+        frame = self._parse_frame(data)
+        if not frame:
+            return
+        _interface_receive_logger.info("%s received layer2 frame", self)
+        return frame
+
+    def _receive_data(self):
+        """
+        Receive the bytes of a layer 2 frame, without parsing it.
+
+        :returns: Bytes of Ethernet frame without FCS, or None.
+        """
         if not self.upup:
             return
         data = super().receive()
@@ -121,31 +202,63 @@ class L2Interface(netscool.layer1.L1Interface):
             return
 
         if len(data) > self.maximum_frame_size:
-            logger.error(
-                "{} Frame to big to be received {} > {}".format(
-                    self, len(data), self.maximum_frame_size))
+            _interface_receive_logger.error(
+                "%s Frame to big to be received %s > %s",
+                self, len(data), self.maximum_frame_size)
             return
 
         # Strip off FCS bytes from end of frame.
         data = data[:-4]
 
+        # Drop anything too short to have a dst MAC, src MAC and ether
+        # type. Checking this here is much cheaper than having scapy fail
+        # to parse the frame, and the switch forwards frames without
+        # parsing them at all.
+        if len(data) < 14:
+            _interface_receive_logger.error(
+                "%s Frame to small to be received %s < 14",
+                self, len(data))
+            return
+        return data
+
+    def _receive_frame_data(self):
+        """
+        Receive the bytes of a layer 2 frame addressed to this interface,
+        without parsing it.
+
+        :returns: Bytes of Ethernet frame without FCS, or None.
+        """
+        data = self._receive_data()
+        if not data:
+            return
+
+        # Check the dst MAC on the raw bytes, so we dont parse frames we
+        # are going to drop anyway.
+        if not self.promiscuous and data[0:6] != self._mac_bytes:
+            _interface_receive_logger.error(
+                '%s frame dst %s didnt match interface mac %s',
+                self, _bytes_to_mac(data[0:6]), self._mac_lower)
+            return
+        return data
+
+    def _parse_frame(self, data):
+        """
+        Parse the bytes of a layer 2 frame with scapy.
+
+        :param data: Bytes of Ethernet frame without FCS.
+        :returns: Scapy Ether object of frame, or None if the frame is
+            invalid.
+        """
         try:
-            frame = scapy.all.Ether(data)
+            return _Ether(data)
         except:
             # scapy couldn't recognise the frame so log the exception and
             # drop it. We catch all exceptions because scapy can raise a
             # wide range on exceptions, and we want to do the same thing
             # in all cases.
-            logger.exception("Invalid Ethernet frame received.")
-            return
-
-        if not self.promiscuous and frame.dst.lower() != self.mac.lower():
-            logger.error(
-                '{} frame dst {} didnt match interface mac {}'.format(
-                    self, frame.dst.lower(), self.mac.lower()))
+            _interface_receive_logger.exception(
+                "Invalid Ethernet frame received.")
             return
-        logger.info("{} received layer2 frame".format(self))
-        return frame
 
     def send(self, frame):
         """
@@ -153,25 +266,32 @@ class L2Interface(netscool.layer1.L1Interface):
 
         :param frame: Scapy Ether object of frame.
         """
-        logger = logging.getLogger('netscool.layer2.interface.send')
-        if not self.upup:
-            logger.error('{} not up/up'.format(self))
+        if not isinstance(frame, _Ether):
+            _interface_send_logger.error(
+                '%s can only send Ether frames', self)
             return
+        self._send_data(bytes(frame))
+
+    def _send_data(self, data):
+        """
+        Send a layer 2 frame that has already been converted to bytes.
 
-        if not isinstance(frame, scapy.all.Ether):
-            logger.error('{} can only send Ether frames'.format(self))
+        :param data: Bytes of Ethernet frame, without FCS.
+        """
+        if not self.upup:
+            _interface_send_logger.error('%s not up/up', self)
             return
 
-        # Convert scapy Ether to bytes and append 4 byte FCS.
-        data = bytes(frame) + b'\0\0\0\0'
+        # Append 4 byte FCS.
+        data += b'\0\0\0\0'
 
         if len(data) > self.maximum_frame_size:
-            logger.error(
-                "{} Frame to big to be sent {} > {}".format(
-                    self, len(data), self.maximum_frame_size))
+            _interface_send_logger.error(
+                "%s Frame to big to be sent %s > %s",
+                self, len(data), self.maximum_frame_size)
             return
 
-        logger.info("{} sending layer2 frame".format(self))
+        _interface_send_logger.info("%s sending layer2 frame", self)
         super().send(data)
 
     def __str__(self):
@@ -180,8 +300,22 @@ class L2Interface(netscool.layer1.L1Interface):
 class Switch(netscool.layer1.BaseDevice):
 
     CAMKey = collections.namedtuple('CAMKey', ['mac', 'vlan'])
-    CAMEntry = collections.namedtuple(
-        'CAMEntry', ['interface', 'last_seen'])
+
+    class CAMEntry():
+        """
+        An entry in the CAM table. Unlike a namedtuple an entry can be
+        updated in place, so we dont need a new entry every time we see
+        a frame from a MAC that is already in the table.
+        """
+        __slots__ = ('interface', 'last_seen')
+
+        def __init__(self, interface, last_seen):
+            self.interface = interface
+            self.last_seen = last_seen
+
+        def __repr__(self):
+            return "CAMEntry(interface={!r}, last_seen={!r})".format(
+                self.interface, self.last_seen)
 
     def __init__(self, name, mac, interfaces):
         super().__init__(name, interfaces)
@@ -197,26 +331,51 @@ class Switch(netscool.layer1.BaseDevice):
             assert isinstance(interface, SwitchPort)
             assert interface.promiscuous
 
+        # MACs of our own interfaces, to quickly check if a frame is
+        # destined for us. See _update_local_macs().
+        self._update_local_macs()
+
         # The CAM (content addressable memory) table that tracks
         # MAC -> interface mappings. Once a MAC is 'learned' and in the
         # CAM table the switch no longer has to flood frames out every
-        # interface to deliver the frame.
-        self.cam = {}
+        # interface to deliver the frame. Entries are kept in the order
+        # they were last seen, oldest first, so we can find expired
+        # entries without checking the whole table. Seeing a frame
+        # reorders the table, so anything outside the event loop must
+        # iterate over a copy eg. list(self.cam.items()), not the table
+        # itself.
+        self.cam = collections.OrderedDict()
 
         # If we dont see a MAC address for this many seconds, then remove
         # the mapping from the table. This timeout removes stale entries
         # from the table eg. A device in unplugged.
         self.cam_timeout = 300
 
+        # Maximum number of frames to handle from each interface in one
+        # pass of the event loop, so a busy interface cant hold up the
+        # others for too long.
+        self.receive_burst = 32
+
+        # Interfaces that are up/up, to flood frames out of. Built when
+        # first needed, and thrown away whenever an interface status
+        # changes. Interfaces only come up while our own event loop
+        # updates them, so the list cant miss one. If an interface is shut
+        # down from the console just as the list is built, it may stay in
+        # the list, but sending on it is dropped as it isnt up/up.
+        self._upup_interfaces = None
+        for interface in self.interfaces:
+            interface._status_changed = self._clear_upup_interfaces
+
     def show_cam(self):
         """
         Print out current entries in the switch CAM table.
         """
-        now = time.time()
+        now = time.monotonic()
 
         print('MAC\t\t\tVLAN\tInterface\tExpires')
         print('-' * 55)
-        for key, entry in self.cam.items():
+        # Copy the table as the event loop can reorder it while we print.
+        for key, entry in list(self.cam.items()):
             expires = int((entry.last_seen + self.cam_timeout) - now)
             print("{}\t{}\t{}\t\t{}".format(
                 key.mac, key.vlan, entry.interface.name, expires))
@@ -225,45 +384,115 @@ class Switch(netscool.layer1.BaseDevice):
         """
         Receive frames and forward them out appropriate interfaces.
         """
-        logger_cam = logging.getLogger('netscool.layer2.switch.cam')
-        logger_recv = logging.getLogger('netscool.layer2.switch.receive')
-        self._timeout_cam_entries()
+        # Use the same time for everything in this pass of the event loop.
+        # Entries live for minutes, so being out by however long the pass
+        # takes doesnt matter. We use a monotonic clock so CAM entries
+        # arent affected if the system clock changes.
+        now = time.monotonic()
+        self._timeout_cam_entries(now)
+        self._update_local_macs()
 
         for interface in self.interfaces:
-            frame = interface.receive()
-            if not frame:
+            # Interfaces that arent up/up cant receive anything.
+            if not interface.upup:
                 continue
 
-            assert isinstance(frame.payload, scapy.all.Dot1Q), "Switch expects only dot1q frames from SwitchPort"
+            # Handle a burst of frames from each interface, so frames that
+            # arrive back to back dont have to wait a whole pass of the
+            # event loop each. Most interfaces have nothing waiting most
+            # of the time, so stop as soon as the receive buffer is empty.
+            for _ in range(self.receive_burst):
+                if not interface.recv_buffer:
+                    break
 
-            # We have nothing to do with frames sent directly to us for
-            # now, so log and ignore.
-            if self._is_local_frame(frame):
-                logger_recv.info("{} Received Frame".format(self))
-                continue
+                # The switch only needs the MACs and vlan of a frame to
+                # forward it, so work with the raw bytes of the frame
+                # rather than having scapy parse it. As we dont go through
+                # receive() we need to capture the frame ourselves.
+                data = interface._receive_tagged_data()
+                if not data:
+                    continue
+                interface._capture_received(data)
+                self._forward(interface, data, now)
 
-            src_mac = frame.src.lower()
-            dst_mac = frame.dst.lower()
-            vlan = frame.payload.vlan
-
-            src_key = Switch.CAMKey(src_mac, vlan)
-            entry = Switch.CAMEntry(interface, time.time())
-            logger_cam.info(
-                "{} Update CAM entry {} -> {}".format(
-                    self, src_key, entry.interface.name))
-            self.cam[src_key] = entry
-
-            dst_key = Switch.CAMKey(dst_mac, vlan)
-            if dst_key in self.cam:
-                logger_cam.info(
-                    "{} CAM entry found {}, sending frame".format(
-                        self, dst_key))
-                self.cam[dst_key].interface.send(frame)
+    def _update_local_macs(self):
+        """
+        Work out the MACs of our own interfaces. Interface MACs can be
+        changed while the switch is running, so this is done at the
+        start of each pass of the event loop rather than only once.
+        """
+        self._local_macs = frozenset(
+            interface._mac_lower for interface in self.interfaces)
+
+    def _forward(self, src_interface, data, now):
+        """
+        Learn the source of a received frame and forward it out the
+        appropriate interfaces.
+
+        :param src_interface: The interface that received the frame.
+        :param data: Bytes of the dot1q tagged frame. The same bytes are
+            sent out of every interface the frame is forwarded to.
+        :param now: Current time from ``time.monotonic()``.
+        """
+        cam = self.cam
+        vlan = _frame_vlan(data)
+        assert vlan is not None, (
+            "Switch expects only dot1q frames from SwitchPort")
+
+        # Broadcast frames are never for one of our interfaces and the
+        # broadcast MAC is never learned in the CAM table, so we dont
+        # need to look it up anywhere. We only check for the broadcast
+        # MAC rather than the multicast bit because netscool doesnt
+        # stop devices using multicast MACs as interface MACs.
+        broadcast = data[0:6] == _BROADCAST_MAC
+
+        # We have nothing to do with frames sent directly to us for
+        # now, so log and ignore.
+        if not broadcast:
+            dst_mac = _bytes_to_mac(data[0:6])
+            if dst_mac in self._local_macs:
+                _switch_receive_logger.info("%s Received Frame", self)
+                return
+
+        # A frame can only come from one device, so a broadcast src MAC
+        # means the frame is malformed and we dont learn it.
+        if data[6:12] != _BROADCAST_MAC:
+            src_mac = _bytes_to_mac(data[6:12])
+
+            # A CAMKey hashes and compares the same as a plain tuple, so
+            # we only need to build a CAMKey when adding a new entry to
+            # the CAM table, and can look entries up with a plain tuple.
+            # Existing entries are updated in place.
+            src_key = (src_mac, vlan)
+            entry = cam.get(src_key)
+            if entry is None:
+                cam[Switch.CAMKey(src_mac, vlan)] = Switch.CAMEntry(
+                    src_interface, now)
             else:
-                logger_cam.info(
-                    "{} CAM entry not found {}, flooding frame".format(
-                        self, dst_key))
-                self._flood(interface, frame)
+                entry.interface = src_interface
+                entry.last_seen = now
+                cam.move_to_end(src_key)
+            _switch_cam_logger.info(
+                "%s Update CAM entry %s vlan %s -> %s",
+                self, src_mac, vlan, src_interface.name)
+
+        if broadcast:
+            _switch_cam_logger.info(
+                "%s broadcast frame vlan %s, flooding frame", self, vlan)
+            self._flood(src_interface, data)
+            return
+
+        dst_entry = cam.get((dst_mac, vlan))
+        if dst_entry:
+            _switch_cam_logger.info(
+                "%s CAM entry found %s vlan %s, sending frame",
+                self, dst_mac, vlan)
+            dst_entry.interface.send(data)
+        else:
+            _switch_cam_logger.info(
+                "%s CAM entry not found %s vlan %s, flooding frame",
+                self, dst_mac, vlan)
+            self._flood(src_interface, data)
 
     def _is_local_frame(self, frame):
         """
@@ -272,46 +501,51 @@ class Switch(netscool.layer1.BaseDevice):
         :param frame: Received frame.
         :returns: True or False
         """
-        for interface in self.interfaces:
-            if frame.dst.lower() == interface.mac.lower():
-                return True
-        return False
+        return frame.dst.lower() in self._local_macs
 
     def _flood(self, src_interface, frame):
         """
         Flood frame out all interfaces, except src_interface.
 
         :param src_interface: The interface that received the frame.
-        :param frame: The frame to flood.
+        :param frame: The frame to flood, as an Ether object or bytes.
         """
-        for interface in self.interfaces:
-            if not interface.upup:
-                continue
-            if interface == src_interface:
+        upup_interfaces = self._upup_interfaces
+        if upup_interfaces is None:
+            upup_interfaces = self._upup_interfaces = [
+                interface for interface in self.interfaces
+                if interface.upup]
+
+        for interface in upup_interfaces:
+            if interface is src_interface:
                 continue
 
             # We assume the interface will ignore anything it cant send eg.
             # frame is from wrong vlan.
             interface.send(frame)
 
-    def _timeout_cam_entries(self):
+    def _clear_upup_interfaces(self):
+        """
+        Throw away the list of up/up interfaces, so _flood() works it out
+        again next time.
+        """
+        self._upup_interfaces = None
+
+    def _timeout_cam_entries(self, now):
         """
         Remove any CAM entries we haven't seen frames for, for
         ``cam_timeout`` seconds.
-        """
-        logger = logging.getLogger('netscool.layer2.switch.cam')
-        now = time.time()
-        to_remove = []
-        for key, entry in self.cam.items():
-            if now - self.cam_timeout > entry.last_seen:
-                to_remove.append(key)
 
-        # Python doesnt like it when you modify a dictionary you are
-        # iterating, so we flag entries for removal, then remove them in
-        # this second loop.
-        for key in to_remove:
-            logger.info("{} timeout CAM entry {}".format(self, key))
-            self.cam.pop(key)
+        :param now: Current time from ``time.monotonic()``.
+        """
+        # The oldest entries are at the front of the CAM table, so we can
+        # stop at the first entry that hasnt expired.
+        while self.cam:
+            key, entry = next(iter(self.cam.items()))
+            if now - self.cam_timeout <= entry.last_seen:
+                break
+            _switch_cam_logger.info("%s timeout CAM entry %s", self, key)
+            self.cam.popitem(last=False)
 
     def __str__(self):
         return "{} ({})".format(super().__str__(), self.mac)
@@ -327,6 +561,12 @@ class SwitchPort(L2Interface):
     ACCESS = 'access'
     TRUNK = 'trunk'
 
+    # What a trunk port does with a frame for a given vlan. See
+    # set_trunk_port().
+    _TRUNK_DROP = 0
+    _TRUNK_TAGGED = 1
+    _TRUNK_UNTAGGED = 2
+
     def __init__(self, name, mac, bandwidth=1000, mtu=1500):
         super().__init__(name, mac, bandwidth, mtu, True)
         self.default_vlan = 1
@@ -342,7 +582,6 @@ class SwitchPort(L2Interface):
 
         :param vlan: The vlan to tag incoming frames with.
         """
-        logger = logging.getLogger('netscool.layer2.switch.port')
         self._vlan = vlan
         if self._vlan == None:
             self._vlan = self.default_vlan
@@ -350,8 +589,13 @@ class SwitchPort(L2Interface):
         self._mode = SwitchPort.ACCESS
         self._allowed_vlans = None
         self._native_vlan = None
-        logger.info(
-            "{} set as {} vlan {}".format(self, self._mode, self._vlan))
+        self._trunk_actions = None
+
+        # Untagged frames received on this port are always tagged with
+        # the same vlan, so build the dot1q header once.
+        self._untagged_dot1q = _dot1q_header(self._vlan)
+        _switch_port_logger.info(
+            "%s set as %s vlan %s", self, self._mode, self._vlan)
 
     def set_trunk_port(self, allowed_vlans=None, native_vlan=None):
         """
@@ -361,19 +605,39 @@ class SwitchPort(L2Interface):
         :param native_vlan: The native vlan for this port, or None to use
             default_vlan.
         """
-        logger = logging.getLogger('netscool.layer2.switch.port')
-        self._allowed_vlans = allowed_vlans
+        # Keep allowed vlans as a set so checking a vlan for each frame
+        # doesnt have to scan a list.
+        self._allowed_vlans = None
+        if allowed_vlans != None:
+            self._allowed_vlans = frozenset(allowed_vlans)
         self._native_vlan = native_vlan
         if self._native_vlan == None:
             self._native_vlan = self.default_vlan
 
         self._mode = SwitchPort.TRUNK
         self._vlan = None
-        logger.info(
-            "{} set as {}, allowed vlans {}, native vlan {}".format(
-                self, self._mode,
-                'all' if self.allow_all_vlan else self._allowed_vlans,
-                self._native_vlan))
+
+        # Work out what to do with frames for every possible vlan now,
+        # so sending and receiving a frame on the trunk only needs to
+        # look up its vlan in this table. vlans are 12 bits so there are
+        # 4096 possible vlans.
+        self._trunk_actions = bytearray(
+            SwitchPort._TRUNK_TAGGED if self.vlan_allowed(vlan)
+            else SwitchPort._TRUNK_DROP
+            for vlan in range(4096))
+        if self.vlan_allowed(self._native_vlan):
+            self._trunk_actions[self._native_vlan] = (
+                SwitchPort._TRUNK_UNTAGGED)
+
+        # Untagged frames received on this port are always tagged with
+        # the native vlan, so build the dot1q header once.
+        self._untagged_dot1q = _dot1q_header(self._native_vlan)
+
+        _switch_port_logger.info(
+            "%s set as %s, allowed vlans %s, native vlan %s",
+            self, self._mode,
+            'all' if self.allow_all_vlan else sorted(self._allowed_vlans),
+            self._native_vlan)
 
     @property
     def allow_all_vlan(self):
@@ -410,42 +674,58 @@ class SwitchPort(L2Interface):
         :returns: The received Ether frame with the appropriate dot1q
             vlan tag.
         """
-        frame = super().receive()
-        if not frame:
+        data = self._receive_tagged_data()
+        if not data:
             return None
+        return self._parse_frame(data)
 
-        logger = logging.getLogger('netscool.layer2.switch.port')
+    def _receive_tagged_data(self):
+        """
+        Receive the bytes of a frame on the switchport, with the
+        appropriate dot1q tag. See receive() for how tags are handled.
+
+        :returns: Bytes of the received Ethernet frame with the
+            appropriate dot1q vlan tag, or None.
+        """
+        data = self._receive_data()
+        if not data:
+            return None
+
+        # Check and add dot1q tags on the raw bytes of the frame, so scapy
+        # only has to parse the frame once it has the right tag.
+        vlan = _frame_vlan(data)
         if self._mode == SwitchPort.ACCESS:
 
             # Access ports should normally only receive untagged frames.
             # How access ports handle tagged frames is vendor, model, and
             # firmware specific. For simplicity we will drop any frame
             # received on an access port with a dot1q tag.
-            if isinstance(frame.payload, scapy.all.Dot1Q):
-                logger.info(
-                    "{} got tagged frame, dropping".format(self))
+            if vlan is not None:
+                _switch_port_logger.info(
+                    "%s got tagged frame, dropping", self)
                 return None
 
             # Tag the received frame with the appropriate vlan.
-            logger.info(
-                "{} tag frame with vlan {}".format(self, self._vlan))
-            return _tag_frame(frame, self._vlan)
+            _switch_port_logger.info(
+                "%s tag frame with vlan %s", self, self._vlan)
+            data = data[:12] + self._untagged_dot1q + data[12:]
 
         elif self._mode == SwitchPort.TRUNK:
-            if not isinstance(frame.payload, scapy.all.Dot1Q):
-                logger.info(
-                    "{} untagged frame, add native vlan {}".format(
-                        self, self._native_vlan))
-                frame = _tag_frame(frame, self._native_vlan)
-
-            vlan = frame.payload.vlan
-            if not self.vlan_allowed(vlan):
-                logger.info(
-                    "{} {} not in allowed vlans".format(
-                        self, vlan))
+            if vlan is None:
+                _switch_port_logger.info(
+                    "%s untagged frame, add native vlan %s",
+                    self, self._native_vlan)
+                vlan = self._native_vlan
+                data = data[:12] + self._untagged_dot1q + data[12:]
+
+            if self._trunk_actions[vlan] == SwitchPort._TRUNK_DROP:
+                _switch_port_logger.info(
+                    "%s %s not in allowed vlans", self, vlan)
                 return None
-            return frame
-        
+
+        _interface_receive_logger.info("%s received layer2 frame", self)
+        return data
+
     def send(self, frame):
         """
         Send a dot1q tagged Ethernet frame. We assume that internally the
@@ -461,47 +741,52 @@ class SwitchPort(L2Interface):
         the native vlan, untag the frame and send it. If it is allowed
         and not the native vlan send the frame with the dot1q tag intact.
 
-        :param frame: dot1q tagged Ethernet frame.
+        :param frame: dot1q tagged Ethernet frame, either as a scapy Ether
+            object or bytes. The switch converts each frame to bytes once
+            and passes the same bytes to every port it sends the frame
+            out of.
         """
-        logger = logging.getLogger('netscool.layer2.switch.port')
-        if not isinstance(frame.payload, scapy.all.Dot1Q):
-            logger.info("{} only expects tagged frames".format(self))
+        data = frame
+        if isinstance(data, _Ether):
+            data = bytes(data)
+
+        vlan = _frame_vlan(data)
+        if vlan is None:
+            _switch_port_logger.info("%s only expects tagged frames", self)
             return
 
         if self._mode == SwitchPort.ACCESS:
-            vlan = frame.payload.vlan
 
             # Frame is not for this access ports vlan, so drop it. When
             # the switch floods frames this is what stops frames leaking
             # to the wrong vlans.
             if vlan != self._vlan:
-                logger.info(
-                    "{} frame not for our vlan, ignoring".format(self))
+                _switch_port_logger.info(
+                    "%s frame not for our vlan, ignoring", self)
                 return
 
             # Frame is for this access ports vlan, so untag it and
             # send it.
-            logger.info(
-                "{} untag frame and send".format(self))
-            frame = _untag_frame(frame)
+            _switch_port_logger.info(
+                "%s untag frame and send", self)
+            data = _untag_data(data)
 
         elif self._mode == SwitchPort.TRUNK:
-            vlan = frame.payload.vlan
 
             # Vlan is not allowed on this trunk, so drop the frame.
-            if not self.vlan_allowed(vlan):
-                logger.info(
-                    "{} {} not in allowed vlans".format(
-                        self, vlan))
+            action = self._trunk_actions[vlan]
+            if action == SwitchPort._TRUNK_DROP:
+                _switch_port_logger.info(
+                    "%s %s not in allowed vlans", self, vlan)
                 return
 
             # Frame is tagged with the native vlan, so untag it and send
             # the frame.
-            if vlan == self._native_vlan:
-                logger.info(
-                    "{} untag frame in native vlan".format(self))
-                frame = _untag_frame(frame)
-        super().send(frame)
+            if action == SwitchPort._TRUNK_UNTAGGED:
+                _switch_port_logger.info(
+                    "%s untag frame in native vlan", self)
+                data = _untag_data(data)
+        self._send_data(data)
 
     def __str__(self):
         return "{}({})".format(super().__str__(), self._mode)
@@ -514,48 +799,88 @@ def _tag_frame(frame, vlan):
     :param vlan: vlan number to put in dot1q header.
     :returns: Ether frame tagged with dot1 vlan.
     """
-    # Make a deepcopy to make sure we dont modify the original frame.
-    new_frame = copy.deepcopy(frame)
+    return _Ether(_tag_data(bytes(frame), vlan))
 
-    # Get the frame payload and ethernet header.
-    payload = new_frame.payload
-    header = new_frame.firstlayer()
+def _untag_frame(frame):
+    """
+    Create a copy of frame with dot1q vlan tag removed.
 
-    # Remove the current payload from the ethernet header so we can
-    # insert the dot1q tag.
-    header.remove_payload()
+    :param frame: Ether frame tagged with dot1q
+    :returns: Ether frame with dot1q tag removed.
+    """
+    data = _untag_data(bytes(frame))
+    if data is None:
+        return None
+    return _Ether(data)
 
-    # Backup the current payload type so we can apply it to the dot1q
-    # header.
-    payload_type = header.type
+def _tag_data(data, vlan):
+    """
+    Add a dot1q vlan tag to the bytes of an Ethernet frame.
 
-    # 0x8100 means the next layer is dot1q.
-    header.type = 0x8100
+    :param data: Bytes of Ethernet frame to tag with dot1q.
+    :param vlan: vlan number to put in dot1q header.
+    :returns: Bytes of Ethernet frame tagged with dot1q.
+    """
+    # Work on the raw bytes of the frame rather than copying and
+    # rearranging scapy layers, which is very slow. The dot1q header is
+    # inserted after the dst and src MAC (12 bytes). The original ether
+    # type then follows the dot1q header, so it can stay where it is.
+    return data[:12] + _dot1q_header(vlan) + data[12:]
 
-    # Reassemble frame with dot1q header.
-    dot1q = scapy.all.Dot1Q(vlan=vlan, type=payload_type)
-    return header/dot1q/payload
+def _dot1q_header(vlan):
+    """
+    Build the bytes of a dot1q header. The first 2 bytes are the 0x8100
+    ether type that marks the frame as tagged, then 2 bytes of vlan.
 
-def _untag_frame(frame):
+    :param vlan: vlan number to put in dot1q header.
+    :returns: 4 bytes of dot1q header.
     """
-    Create a copy of frame with dot1q vlan tag removed.
+    return struct.pack('!HH', 0x8100, vlan & 0x0FFF)
 
-    :param frame: Ether frame tagged with dot1q
-    :returns: Ether frame with dot1q tag removed.
+def _untag_data(data):
     """
-    # Make a deepcopy to make sure we dont modify the original frame.
-    new_frame = copy.deepcopy(frame)
+    Remove the dot1q vlan tag from the bytes of an Ethernet frame.
 
+    :param data: Bytes of Ethernet frame tagged with dot1q.
+    :returns: Bytes of Ethernet frame with dot1q tag removed, or None if
+        the frame isnt tagged.
+    """
     # Check this frame has a dot1q tag.
-    dot1q = new_frame.payload
-    if not isinstance(dot1q, scapy.all.Dot1Q):
+    if data[12:14] != b'\x81\x00':
         return None
 
-    # Get the new frame header and payload.
-    payload = dot1q.payload
-    header = new_frame.firstlayer()
+    # Cut the 4 byte dot1q header out of the frame, which leaves the
+    # dot1q ether type in the ethernet header.
+    return data[:12] + data[16:]
+
+def _bytes_to_mac(data):
+    """
+    Convert the 6 bytes of a MAC address to a lowercase string in the form
+    xx:xx:xx:xx:xx:xx, the same as scapy uses for Ether.src and Ether.dst.
+
+    :param data: 6 bytes of MAC address.
+    :returns: MAC address string.
+    """
+    return data.hex(':')
 
-    # Remove the dot1q payload and add the underlying payload.
-    header.remove_payload()
-    header.type = dot1q.type
-    return header/payload
+def _mac_to_bytes(mac):
+    """
+    Convert a MAC address string in the form XX:XX:XX:XX:XX:XX to its 6
+    bytes.
+
+    :param mac: MAC address string.
+    :returns: 6 bytes of MAC address.
+    """
+    return bytes.fromhex(mac.replace(':', ''))
+
+def _frame_vlan(data):
+    """
+    Get the vlan from the dot1q header of the bytes of an Ethernet frame,
+    without having scapy parse the whole frame.
+
+    :param data: Bytes of Ethernet frame.
+    :returns: vlan number, or None if the frame isnt dot1q tagged.
+    """
+    if len(data) < 16 or data[12:14] != b'\x81\x00':
+        return None
+    return struct.unpack_from('!H', data, 14)[0] & 0x0FFF
@@ -1,3 +1,5 @@
+import socket
+import struct
 import logging
 import ipaddress
 import collections
@@ -7,19 +9,42 @@ import scapy.all
 import netscool.layer1
 import netscool.layer2
 
+# Module loggers, see netscool.layer1 for why.
+_device_receive_logger = logging.getLogger('netscool.layer3.device.receive')
+_device_send_logger = logging.getLogger('netscool.layer3.device.send')
+_router_logger = logging.getLogger('netscool.layer3.router')
+_ip_receive_logger = logging.getLogger('netscool.layer3.ip.receive')
+_ip_send_logger = logging.getLogger('netscool.layer3.ip.send')
+
 class ARP():
     """
     ARP table with mapping of nexthop IP to destination MAC address.
     """
+    __slots__ = ('table',)
+
     def __init__(self):
         self.table = {}
 
     def lookup(self, ip):
         return self.table.get(str(ip), None)
 
+def _ip_to_int(ip):
+    """
+    Convert a dotted quad IPv4 address string, such as the src or dst of a
+    scapy IP packet, to an integer. This is much quicker than creating an
+    ipaddress.IPv4Address for every packet.
+
+    :param ip: IPv4 address string eg. "192.168.0.15".
+    :returns: IPv4 address as an integer.
+    """
+    return struct.unpack('!I', socket.inet_aton(ip))[0]
+
 ROUTE_AD_DIRECT = 0
 ROUTE_AD_STATIC = 1
 
+# Network matched by default routes.
+_DEFAULT_NETWORK = ipaddress.IPv4Network('0.0.0.0/0')
+
 class Route():
     """
     Route to specify an interface to send packets for a specified IPv4
@@ -41,6 +66,9 @@ class Route():
         via this route. If there is no next hop destination IP from packet
         is used.
     """
+    __slots__ = (
+        'network', 'interface', 'nexthop', 'ad', 'metric', 'balance_metric')
+
     def __init__(self, network, interface, ad, metric, nexthop=None):
         self.network = network
         self.interface = interface
@@ -69,30 +97,90 @@ class Route():
         return self.__str__()
 
 class RouteTable():
+
+    # Maximum number of IPs to cache lookups for. When the cache is full
+    # it is cleared and starts filling again.
+    LOOKUP_CACHE_SIZE = 8192
+
     def __init__(self):
         self.routes = []
 
+    @property
+    def routes(self):
+        """
+        List of installed routes. Treat this as read only, lookup() uses
+        an index of the routes that changing the list directly doesnt
+        update. Use install() to add routes, or assign a new list to
+        replace them all, which rebuilds the index.
+        """
+        return self._routes
+
+    @routes.setter
+    def routes(self, routes):
+        self._routes = routes
+        self._build_index()
+
+    def _build_index(self):
+        """
+        Build the index lookup() and install() use to find routes. Routes
+        are grouped by netmask, then by the integer of their network
+        address. To find the longest matching prefix for an IP we only
+        need to mask the IP for each prefix length in the table, longest
+        first, and look up the result. This is a handful of dict lookups
+        rather than checking the IP against every route.
+        """
+        # {netmask: {network: [routes]}}
+        self._networks = {}
+        self._index = []
+        for route in self._routes:
+            self._index_route(route)
+
+        # Cache of IP -> matching routes found by lookup(). Packets
+        # usually go to the same few destinations over and over, so this
+        # saves searching the index for most packets. It has to be
+        # cleared whenever the index changes.
+        self._lookup_cache = {}
+
+    def _index_route(self, route):
+        """
+        Add a route to the index.
+
+        :param route: Route to add.
+        """
+        netmask = int(route.network.netmask)
+        networks = self._networks.get(netmask)
+        if networks is None:
+            networks = self._networks[netmask] = {}
+
+            # List of (netmask, {network: [routes]}). A longer prefix has
+            # a bigger netmask, so sorting by netmask puts the longest
+            # prefix first. This only needs updating for a new prefix
+            # length.
+            self._index = sorted(self._networks.items(), reverse=True)
+
+        networks.setdefault(
+            int(route.network.network_address), []).append(route)
+
     def install(self, route):
 
         if not route.network or not route.interface:
             return False
 
-        new_routes = []
+        # We only need to compare against existing routes for the same
+        # network as the route we are trying to add.
+        network = route.network
+        existing_routes = self._networks.get(
+            int(network.netmask), {}).get(
+                int(network.network_address), [])
+        kept_routes = []
 
         add_route = True
-        for existing_route in self.routes:
-
-            # Route is for a different network so keep it.
-            if existing_route.network != route.network:
-                new_routes.append(existing_route)
-                continue
-            # From here these existing routes are for the same network
-            # as the route we are trying to add.
+        for existing_route in existing_routes:
 
             # Route has a better ad so keep it and dont add the new route.
             if existing_route.ad < route.ad:
                 add_route = False
-                new_routes.append(existing_route)
+                kept_routes.append(existing_route)
                 continue
 
             # Route has a worse ad so dont keep it.
@@ -105,7 +193,7 @@ class RouteTable():
             # route.
             if existing_route.metric < route.metric:
                 add_route = False
-                new_routes.append(existing_route)
+                kept_routes.append(existing_route)
                 continue
 
             # Route has a worse metric so dont keep it.
@@ -115,56 +203,86 @@ class RouteTable():
             # If we reach here then the existing route is equal to the
             # route we are adding. We should keep the existing one, add
             # the new one, and load balance between the two.
-            new_routes.append(existing_route)
-
-        if add_route:
-            new_routes.append(route)
-
-        self.routes = new_routes
+            kept_routes.append(existing_route)
+
+        if len(kept_routes) < len(existing_routes):
+            # Some existing routes have been replaced so rebuild the table
+            # without them. This only happens when a better route for a
+            # network is installed, so it doesnt need to be quick.
+            new_routes = [
+                existing_route for existing_route in self._routes
+                if existing_route.network != network or any(
+                    existing_route is kept_route
+                    for kept_route in kept_routes)]
+            if add_route:
+                new_routes.append(route)
+            self.routes = new_routes
+        elif add_route:
+            self._routes.append(route)
+            self._index_route(route)
+            self._lookup_cache = {}
         return add_route
 
     def lookup(self, ip):
         """
         Given a destination IP address, lookup best route to send via.
 
-        :param ip: ipaddress.IPv4Address to lookup route for.
-        :return: Best route to send via.
+        :param ip: ipaddress.IPv4Address, or integer of IPv4 address, to
+            lookup route for.
+        :return: Best route to send via, or None if no route matches.
         """
-        matched_route = None
-        for route in self.routes:
-
-            # Route is for a different network so ignore.
-            if ip not in route.network:
-                continue
-
-            # This route is for our network and we havent got another
-            # match yet so this is the best so far.
-            if not matched_route:
-                matched_route = route
-                continue
-
-            # We have matched another route with a more specific prefix
-            # so ignore this one.
-            if matched_route.network.prefixlen > route.network.prefixlen:
-                continue
-
-            # This route is more specific that the previous best so it
-            # becomes the new best.
-            if matched_route.network.prefixlen < route.network.prefixlen:
-                matched_route = route
-                continue
+        ip = int(ip)
+
+        # We cache the list of all equally good routes rather than the
+        # route we choose, so we still load balance between them. Routes
+        # can be installed from another thread while we search, which
+        # replaces the cache once the index is updated. Keeping hold of
+        # the cache we started with means a result from the old index
+        # can only end up in the old cache.
+        cache = self._lookup_cache
+        routes = cache.get(ip)
+        if routes is None:
+            routes = self._search_index(ip)
+            if len(cache) >= RouteTable.LOOKUP_CACHE_SIZE:
+                cache.clear()
+            cache[ip] = routes
+        if not routes:
+            return None
 
-            # This route is equally as good the current match so we
-            # should 'load balance' our selection. 'balance_metric' keeps
-            # track of how many times we have selected a route and we
-            # choose the route that has been used less.
+        # Most networks only have one route, in which case there is
+        # nothing to balance and we dont need to count its use.
+        if len(routes) == 1:
+            return routes[0]
+
+        # All these routes are equally as good so we should 'load
+        # balance' our selection. 'balance_metric' keeps track of how
+        # many times we have selected a route and we choose the route
+        # that has been used less.
+        matched_route = routes[0]
+        for route in routes:
             if matched_route.balance_metric > route.balance_metric:
                 matched_route = route
-                continue
 
         matched_route.balance_metric += 1
         return matched_route
 
+    def _search_index(self, ip):
+        """
+        Search the route index for the routes with the longest prefix
+        matching ip.
+
+        :param ip: Integer of IPv4 address.
+        :return: List of matching routes, which is empty if no route
+            matches.
+        """
+        # The first prefix length with a route for the IPs network is the
+        # longest, and therefore most specific, match.
+        for netmask, networks in self._index:
+            routes = networks.get(ip & netmask)
+            if routes:
+                return routes
+        return []
+
 class L3Device(netscool.layer1.BaseDevice):
     """
     A basic layer 3 device that logs any packet it receives.
@@ -184,7 +302,7 @@ class L3Device(netscool.layer1.BaseDevice):
         for interface in self.interfaces:
             assert isinstance(interface, IPInterface)
 
-            network = ipaddress.IPv4Network(interface.ipv4, strict=False)
+            network = interface.ipv4.network
 
             # This is a route for a directly connected network. Any packet
             # that matches this route is destined for this network and
@@ -204,7 +322,7 @@ class L3Device(netscool.layer1.BaseDevice):
             if gateway in network:
                 self.routetable.install(
                     Route(
-                        network=ipaddress.IPv4Network('0.0.0.0/0'),
+                        network=_DEFAULT_NETWORK,
                         interface=interface,
                         nexthop=gateway,
                         ad=ROUTE_AD_STATIC,
@@ -214,13 +332,15 @@ class L3Device(netscool.layer1.BaseDevice):
         """
         Receive packets and log them.
         """
-        logger = logging.getLogger("netscool.layer3.device.receive")
         for interface in self.interfaces:
             packet = interface.receive()
             if not packet:
                 continue
-            logger.info(
-                "{} got packet\n{}".format(self, packet.show(dump=True)))
+
+            # Only dump the packet if it will be logged, see L2Device.
+            if _device_receive_logger.isEnabledFor(logging.INFO):
+                _device_receive_logger.info(
+                    '%s got packet\n%s', self, packet.show(dump=True))
 
     def send(self, packet):
         """
@@ -232,17 +352,17 @@ class L3Device(netscool.layer1.BaseDevice):
         """
 
         # Lookup most appropriate route to send packet.
-        dst_ip = ipaddress.IPv4Address(packet.dst)
-        route = self.routetable.lookup(dst_ip)
+        route = self.routetable.lookup(_ip_to_int(packet.dst))
         if not route:
-            logger.info("{} no route matched {}".format(self, dst_ip))
+            _device_send_logger.info(
+                "%s no route matched %s", self, packet.dst)
             return
 
         # Determine the nexthop so we can figure out the appropriate
         # destination MAC to build an ethernet frame.
         nexthop = route.nexthop
         if nexthop is None:
-            nexthop = dst_ip
+            nexthop = packet.dst
         dst_mac = self.arp.lookup(nexthop)
         route.interface.send(packet, dst_mac)
 
@@ -260,7 +380,7 @@ class Router(netscool.layer1.BaseDevice):
         for interface in self.interfaces:
             assert isinstance(interface, IPInterface)
 
-            network = ipaddress.IPv4Network(interface.ipv4, strict=False)
+            network = interface.ipv4.network
 
             # This is a route for a directly connected network. Any packet
             # that matches this route is destined for this network and
@@ -274,52 +394,72 @@ class Router(netscool.layer1.BaseDevice):
                     ad=ROUTE_AD_DIRECT,
                     metric=0))
 
+        # IPs of our own interfaces as integers, to quickly check if a
+        # packet is destined for us. See _update_local_ips().
+        self._update_local_ips()
+
+    def _update_local_ips(self):
+        """
+        Work out the IPs of our own interfaces. Interface IPs can be
+        changed while the router is running, so this is done at the
+        start of each pass of the event loop rather than only once.
+        """
+        self._local_ips = frozenset(
+            int(interface.ipv4.ip) for interface in self.interfaces)
+
     def event_loop(self):
         """
         Receive IP packets and forward them out an appropriate interface
         according to the configured routes.
         """
-        logger = logging.getLogger("netscool.layer3.router")
+        # Look these up once rather than for every packet.
+        self._update_local_ips()
+        local_ips = self._local_ips
+        route_lookup = self.routetable.lookup
+        arp_lookup = self.arp.lookup
+
         for interface in self.interfaces:
             packet = interface.receive()
             if not packet:
                 continue
 
+            # Convert the dst IP to an integer once, and use it for
+            # everything else we do with this packet.
+            dst_ip = _ip_to_int(packet.dst)
+
             # Packet is addressed to the router. We dont have anything
             # to do with it yet so just drop for now.
-            if self._is_local(packet):
-                logger.info("{} Receive Packet".format(self))
+            if dst_ip in local_ips:
+                _router_logger.info("%s Receive Packet", self)
                 continue
 
             # Send the packet out the interface for the first route that
             # matches. If no route matches then the packet is silently
             # dropped.
-            ip = ipaddress.IPv4Address(packet.dst)
-            route = self.routetable.lookup(ip)
+            route = route_lookup(dst_ip)
             if not route:
-                logger.info("{} no route for {}".format(self, ip))
+                _router_logger.info("%s no route for %s", self, packet.dst)
                 continue
 
             # Determine the nexthop so we can figure out the appropriate
             # destination MAC to build an ethernet frame.
             nexthop = route.nexthop
             if nexthop is None:
-                nexthop = ip
-            dst_mac = self.arp.lookup(nexthop)
-            logger.info(
-                "{} route {} matched, forwarding out {}".format(
-                    self, route.network, route.interface))
+                nexthop = packet.dst
+            dst_mac = arp_lookup(nexthop)
+            _router_logger.info(
+                "%s route %s matched, forwarding out %s",
+                self, route.network, route.interface)
             route.interface.send(packet, dst_mac)
 
     def add_static_route(self, network, nexthop=None, out_interface=None):
-        logger = logging.getLogger("netscool.layer3.router")
         if (
             (nexthop is None and out_interface is None) or
             (nexthop and out_interface)):
 
-            logger.error(
-                "{} must specify nexthop OR out interface for static"
-                " route".format(self))
+            _router_logger.error(
+                "%s must specify nexthop OR out interface for static"
+                " route", self)
             return
 
         network = ipaddress.IPv4Network(network)
@@ -332,17 +472,17 @@ class Router(netscool.layer1.BaseDevice):
                 if nexthop not in interface.ipv4.network:
                     continue
                 if nexthop == interface.ipv4.ip:
-                    logger.error(
-                        "{} nexthop must be remote address not local"
-                        " interface address".format(self))
+                    _router_logger.error(
+                        "%s nexthop must be remote address not local"
+                        " interface address", self)
                     return
                 out_interface = interface
                 break
 
         if out_interface is None:
-            logger.error(
-                "{} could not determine out interface for"
-                " nexthop {}".format(nexthop))
+            _router_logger.error(
+                "%s could not determine out interface for"
+                " nexthop %s", self, nexthop)
             return
 
         return self.routetable.install(
@@ -367,16 +507,22 @@ class Router(netscool.layer1.BaseDevice):
         """
         Is the packet destined to a local interface IP.
         """
-        dst_ip = ipaddress.IPv4Address(packet.dst)
-        for interface in self.interfaces:
-            if interface.ipv4.ip == dst_ip:
-                return True
-        return False
+        return _ip_to_int(packet.dst) in self._local_ips
+
+# Ether type bytes for an Ethernet frame carrying an IPv4 packet.
+_ETHER_TYPE_IP = struct.pack('!H', scapy.all.ETH_P_IP)
+_IP = scapy.all.IP
+_Ether = scapy.all.Ether
 
 class IPInterface(netscool.layer2.L2Interface):
     """
     Layer 3 interface that sends and receives IPv4 packets.
     """
+
+    # Maximum number of dst MACs to cache Ethernet headers for. When the
+    # cache is full it is cleared and starts filling again.
+    IP_HEADER_CACHE_SIZE = 1024
+
     def __init__(
         self, name, ipv4, mac, bandwidth=1000, mtu=1500, promiscuous=False):
         """
@@ -395,33 +541,44 @@ class IPInterface(netscool.layer2.L2Interface):
         super().__init__(name, mac, bandwidth, mtu, promiscuous)
         self.ipv4 = ipaddress.IPv4Interface(ipv4)
 
+    @netscool.layer2.L2Interface.mac.setter
+    def mac(self, val):
+        netscool.layer2.L2Interface.mac.fset(self, val)
+
+        # Cache of dst MAC -> Ethernet header bytes for sending IP packets
+        # to that MAC. The headers include our MAC so it has to be cleared
+        # when our MAC changes.
+        self._ip_headers = {}
+
     def receive(self):
         """
         Receive layer 3 IP packet.
 
         :return: scapy.all.IP packet.
         """
-        logger = logging.getLogger('netscool.layer3.ip.receive')
-
-        # Get the received frame from layer 2.
-        frame = super().receive()
-        if not frame:
+        # Get the received frame bytes from layer 2. We dont need scapy
+        # to parse the Ethernet header, so only the IP packet is parsed.
+        data = self._receive_frame_data()
+        if not data:
             return None
 
         # If the frame does not encapsulate an IPv4 packet then discard
         # it. This does not account IP packets encapsulated in other
         # headers eg. Dot1Q, LLC/SNAP.
-        if frame.type != scapy.all.ETH_P_IP:
-            logger.error(
-                "{} Invalid ethtype for ipv4 0x{0:x}".format(
-                    self, frame.type))
+        if data[12:14] != _ETHER_TYPE_IP:
+            _ip_receive_logger.error(
+                "%s Invalid ethtype for ipv4 0x%x",
+                self, struct.unpack_from('!H', data, 12)[0])
             return None
 
         # Check we got an IP packet.
-        packet = frame.payload
-        if type(packet) != scapy.all.IP:
-            logger.error(
-                "{} Frame payload not parsed as ipv4".format(self))
+        try:
+            packet = _IP(data[14:])
+        except:
+            # Catch all exceptions for the same reason as
+            # L2Interface._parse_frame().
+            _ip_receive_logger.exception(
+                "%s Frame payload not parsed as ipv4", self)
             return None
         return packet
 
@@ -431,16 +588,30 @@ class IPInterface(netscool.layer2.L2Interface):
 
         :param packet: scapy.all.IP() packet.
         """
-        logger = logging.getLogger('netscool.layer3.ip.send')
-
         # We only support sending IP packets.
-        if not isinstance(packet, scapy.all.IP):
-            logger.error("{} can only send IPv4 packets".format(self))
+        if not isinstance(packet, _IP):
+            _ip_send_logger.error("%s can only send IPv4 packets", self)
+            return
+
+        # Without a dst MAC leave it to scapy to fill in the Ethernet
+        # header.
+        if dst_mac is None:
+            ethernet = _Ether(src=self.mac)
+            super().send(ethernet/packet)
             return
 
-        # Create Ethernet frame and encapsulate IP packet before sending.
-        ethernet = scapy.all.Ether(src=self.mac, dst=dst_mac)
-        super().send(ethernet/packet)
+        # Encapsulate the IP packet by putting the Ethernet header bytes in
+        # front of it, rather than building a scapy Ether frame around the
+        # packet for scapy to turn back into bytes.
+        header = self._ip_headers.get(dst_mac)
+        if header is None:
+            header = (
+                netscool.layer2._mac_to_bytes(dst_mac) + self._mac_bytes +
+                _ETHER_TYPE_IP)
+            if len(self._ip_headers) >= IPInterface.IP_HEADER_CACHE_SIZE:
+                self._ip_headers.clear()
+            self._ip_headers[dst_mac] = header
+        self._send_data(header + bytes(packet))
 
     def __str__(self):
         return "{} ({})".format(super().__str__(), self.ipv4)
@@ -33,16 +33,22 @@ import logging
 # List of logger names we want to see logs from.
 _name_filters = []
 
+# _name_filters as a tuple, so LogFilter can check a record against every
+# name with a single str.startswith() call. Must be updated whenever
+# _name_filters changes.
+_name_filters_tuple = ()
+
 def add(name):
     """
     Add a logger to the list of loggers we want to see logs from.
 
     :param name: Name of logger to add.
     """
-    global _name_filters
+    global _name_filters, _name_filters_tuple
     if name in _name_filters:
         return
     _name_filters.append(name)
+    _name_filters_tuple = tuple(_name_filters)
 
 def remove(name):
     """
@@ -50,18 +56,20 @@ def remove(name):
 
     :param name: Name of logger to remove.
     """
-    global _name_filters
+    global _name_filters, _name_filters_tuple
     if name not in _name_filters:
         return
     _name_filters.remove(name)
+    _name_filters_tuple = tuple(_name_filters)
 
 def clear():
     """
     Clear list of loggers we want to see. Won't see any logs until a
     logger is added user add().
     """
-    global _name_filters
+    global _name_filters, _name_filters_tuple
     _name_filters = []
+    _name_filters_tuple = ()
 
 def list():
     """
@@ -90,11 +98,8 @@ class LogFilter():
     Filter to only show logs that we have said we want to see with add().
     """
     def filter(self, record):
-        global _name_filters
-        for name_filter in _name_filters:
-            if record.name.startswith(name_filter):
-                return True
-        return False
+        global _name_filters_tuple
+        return record.name.startswith(_name_filters_tuple)
 
 def setup(log_format="%(message)s"):
     """
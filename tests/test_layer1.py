@@ -1,7 +1,9 @@
 import time
+import select
 import pytest
 import netscool
 import netscool.layer1
+import scapy.all
 
 @pytest.fixture
 def network(request):
@@ -429,3 +431,56 @@ def test_interface_send_receive(network):
             assert recv == data 
             assert int1.captured(data, netscool.layer1.DIR_OUT)
             assert int2.captured(data, netscool.layer1.DIR_IN)
+
+def test_interface_capture_send_duplicates():
+    """
+    Test sending the same data multiple times is captured each time.
+    """
+    interface = netscool.layer1.L1Interface('int1')
+    interface.line_status = netscool.layer1.LINE_UP
+
+    data = b'aaa'
+    interface.send(data)
+    interface.send(data)
+    assert [cap.data for cap in interface.capture] == [data, data]
+    assert all(
+        cap.direction == netscool.layer1.DIR_OUT
+        for cap in interface.capture)
+
+def test_interface_captured_short_data():
+    """
+    Test searching for a layer in captured data too short to contain it.
+    """
+    interface = netscool.layer1.L1Interface('int1')
+    interface.line_status = netscool.layer1.LINE_UP
+
+    interface.send(b'aaa')
+    assert interface.captured(b'aaa')
+    assert not interface.captured(scapy.all.Ether())
+    assert not interface.captured(scapy.all.IP())
+    assert not interface.captured('aaa')
+
+def test_interface_send_wakes_device(basedevice):
+    """
+    Test sending data on an interface wakes the device it belongs to.
+    """
+    dev, int1, int2 = basedevice
+    int1.line_status = netscool.layer1.LINE_UP
+
+    # A device that isnt started has nothing to wake.
+    int1.send(b'aaa')
+    assert dev._wake_socket is None
+
+    # The wake sockets are opened when the device is started, open them
+    # without starting the device thread so nothing drains them.
+    dev._open_wake_sockets()
+    try:
+        def woken():
+            readable, _, _ = select.select([dev._wake_socket], [], [], 0)
+            return bool(readable)
+
+        assert not woken()
+        int1.send(b'aaa')
+        assert woken()
+    finally:
+        dev._close_wake_sockets()
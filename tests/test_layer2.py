@@ -522,7 +522,9 @@ def test_switch_cam_populate(switch_network):
         # this test. For now this is OK but if we have more divergent
         # CAM table implementations in the future then this test should be
         # split into lesson specific tests.
-        for cam_key in cam:
+        # The switch reorders its CAM table as it sees frames, so search
+        # a copy.
+        for cam_key in list(cam):
             # For lesson2 example Switch, where only 'mac' is used for
             # CAM table.
             if isinstance(cam_key, str):
@@ -697,6 +699,90 @@ def test_switch_cam_timeout(switch_network):
     # within a reasonable range thats fine.
     assert switch.cam_timeout <= time.time() - start <= switch.cam_timeout + 1
 
+def test_switch_cam_timeout_oldest_first():
+    """
+    Test Switch CAM table only times out entries that have expired, and
+    seeing a frame from a MAC again keeps its entry in the table.
+    """
+    switch = netscool.layer2.Switch(
+        'sw0', '00:00:00:00:00:00', [
+            netscool.layer2.SwitchPort('0/0', '00:00:00:00:00:01')])
+    interface = switch.interface('0/0')
+    switch.cam_timeout = 10
+
+    def _frame(src):
+        return netscool.layer2._tag_data(
+            bytes(Ether(src=src, dst='22:22:22:22:22:22')), 1)
+
+    for i, now in enumerate([0, 1, 5, 12]):
+        switch._forward(
+            interface, _frame('11:11:11:11:11:0{}'.format(i)), now)
+
+    # Seeing the oldest MAC again moves its entry to the end of the table.
+    switch._forward(interface, _frame('11:11:11:11:11:00'), 15)
+    assert [key.mac for key in switch.cam] == [
+        '11:11:11:11:11:01', '11:11:11:11:11:02', '11:11:11:11:11:03',
+        '11:11:11:11:11:00']
+
+    switch._timeout_cam_entries(20)
+    assert [key.mac for key in switch.cam] == [
+        '11:11:11:11:11:03', '11:11:11:11:11:00']
+
+def test_switch_broadcast_src_not_learned():
+    """
+    Test Switch doesnt learn the broadcast MAC from malformed frames.
+    """
+    switch = netscool.layer2.Switch(
+        'sw0', '00:00:00:00:00:00', [
+            netscool.layer2.SwitchPort('0/0', '00:00:00:00:00:01')])
+    data = netscool.layer2._tag_data(
+        bytes(Ether(src='ff:ff:ff:ff:ff:ff', dst='22:22:22:22:22:22')), 1)
+    switch._forward(switch.interface('0/0'), data, 0)
+    assert len(switch.cam) == 0
+
+def test_switch_local_macs():
+    """
+    Test Switch picks up changes to its interface MACs.
+    """
+    switch = netscool.layer2.Switch(
+        'sw0', '00:00:00:00:00:00', [
+            netscool.layer2.SwitchPort('0/0', '00:00:00:00:00:01')])
+    assert switch._local_macs == {'00:00:00:00:00:01'}
+
+    switch.interface('0/0').mac = '00:00:00:00:00:AA'
+    switch.event_loop()
+    assert switch._local_macs == {'00:00:00:00:00:aa'}
+
+def test_switch_flood_direct():
+    """
+    Test Switch floods frames out every up/up interface except the one
+    the frame came from, without running the event loop first.
+    """
+    switch = netscool.layer2.Switch(
+        'sw0', '00:00:00:00:00:00', [
+            netscool.layer2.SwitchPort('0/0', '00:00:00:00:00:01'),
+            netscool.layer2.SwitchPort('0/1', '00:00:00:00:00:02'),
+            netscool.layer2.SwitchPort('0/2', '00:00:00:00:00:03')])
+    for interface in switch.interfaces[:2]:
+        interface.line_status = netscool.layer1.LINE_UP
+        interface.protocol_status = netscool.layer2.L2Interface.PROTOCOL_UP
+
+    data = netscool.layer2._tag_data(
+        bytes(Ether(src='11:11:11:11:11:11', dst='ff:ff:ff:ff:ff:ff')), 1)
+    switch._flood(switch.interface('0/0'), data)
+    assert [len(interface.send_buffer) for interface in switch.interfaces] == [
+        0, 1, 0]
+
+    # Changes to interface status should change where frames are flooded.
+    switch.interface('0/1').protocol_status = (
+        netscool.layer2.L2Interface.PROTOCOL_DOWN)
+    switch.interface('0/2').line_status = netscool.layer1.LINE_UP
+    switch.interface('0/2').protocol_status = (
+        netscool.layer2.L2Interface.PROTOCOL_UP)
+    switch._flood(switch.interface('0/0'), data)
+    assert [len(interface.send_buffer) for interface in switch.interfaces] == [
+        0, 1, 1]
+
 @pytest.mark.parametrize(
     'switch_vlan_network', [
         # Test reference Switch.
@@ -975,6 +1061,56 @@ def test_vlan_mtu(switch_vlan_network):
             assert dev2.interface('0/0').captured(mtu_frame, netscool.DIR_IN)
 
     netscool.clear_captures(sw0, sw1, dev0, dev1, dev2, dev3)
+
+def test_tag_untag_data():
+    """
+    Test dot1q tags are added to and removed from frame bytes correctly.
+    """
+    frame = Ether(src='11:11:11:11:11:11', dst='22:22:22:22:22:22')/'AAAA'
+    data = bytes(frame)
+    assert netscool.layer2._frame_vlan(data) == None
+    assert netscool.layer2._untag_data(data) == None
+
+    tagged = netscool.layer2._tag_data(data, 100)
+    assert tagged == bytes(
+        Ether(src='11:11:11:11:11:11', dst='22:22:22:22:22:22')/
+        Dot1Q(vlan=100, type=frame.type)/'AAAA')
+    assert netscool.layer2._frame_vlan(tagged) == 100
+    assert netscool.layer2._untag_data(tagged) == data
+
+def test_trunk_actions():
+    """
+    Test trunk ports work out the right action for each vlan.
+    """
+    SwitchPort = netscool.layer2.SwitchPort
+    port = SwitchPort('0/0', '00:00:00:00:00:01')
+    port.set_trunk_port(allowed_vlans=[100, 200], native_vlan=100)
+    assert port._trunk_actions[100] == SwitchPort._TRUNK_UNTAGGED
+    assert port._trunk_actions[200] == SwitchPort._TRUNK_TAGGED
+    assert port._trunk_actions[1] == SwitchPort._TRUNK_DROP
+
+    # A native vlan that isnt allowed is dropped like any other vlan.
+    port.set_trunk_port(allowed_vlans=[100, 200])
+    assert port._trunk_actions[1] == SwitchPort._TRUNK_DROP
+    assert port._trunk_actions[100] == SwitchPort._TRUNK_TAGGED
+
+    port.set_trunk_port()
+    assert port._trunk_actions[1] == SwitchPort._TRUNK_UNTAGGED
+    assert port._trunk_actions.count(SwitchPort._TRUNK_TAGGED) == 4095
+
+    port.set_access_port(100)
+    assert port._trunk_actions == None
+
+def test_bytes_to_mac():
+    """
+    Test MACs read from frame bytes match the MACs scapy parses.
+    """
+    data = bytes(Ether(src='AA:BB:CC:DD:EE:0F', dst='01:02:03:04:05:06'))
+    frame = Ether(data)
+    assert netscool.layer2._bytes_to_mac(data[0:6]) == frame.dst
+    assert netscool.layer2._bytes_to_mac(data[6:12]) == frame.src
+    assert netscool.layer2._bytes_to_mac(data[6:12]) == 'aa:bb:cc:dd:ee:0f'
+    assert netscool.layer2._mac_to_bytes('AA:BB:CC:DD:EE:0F') == data[6:12]
  
 def assert_vlan_frame(cap, src_mac, dst_mac, vlan):
     """
@@ -1,4 +1,5 @@
 import ipaddress
+import scapy.all
 import netscool.layer3
 
 def test_routetable_install():
@@ -144,3 +145,62 @@ def test_routetable_lookup():
     assert routetable.lookup(ipaddress.IPv4Address('10.0.0.1')) == route
     assert routetable.lookup(ipaddress.IPv4Address('10.0.0.1')) == route2
     assert routetable.lookup(ipaddress.IPv4Address('10.0.0.1')) == route
+
+    # Test no route matches, then a default route matches everything
+    # without a more specific route.
+    assert routetable.lookup(ipaddress.IPv4Address('192.168.0.1')) == None
+
+    route3 = netscool.layer3.Route(
+        network=ipaddress.IPv4Network('0.0.0.0/0'), interface='dummy3',
+        nexthop=None, ad=0, metric=0)
+    assert routetable.install(route3) == True
+    assert routetable.lookup(ipaddress.IPv4Address('192.168.0.1')) == route3
+    assert routetable.lookup(ipaddress.IPv4Address('10.0.0.1')) == route2
+
+def test_ip_to_int():
+    for ip in ['0.0.0.0', '10.0.0.1', '192.168.255.254', '255.255.255.255']:
+        assert netscool.layer3._ip_to_int(ip) == int(
+            ipaddress.IPv4Address(ip))
+
+def test_ipinterface_send_header():
+    interface = netscool.layer3.IPInterface(
+        'i0', '10.0.0.1/24', '00:00:00:00:00:01')
+    sent = []
+    interface._send_data = sent.append
+    packet = scapy.all.IP(src='10.0.0.1', dst='10.0.0.2')
+
+    interface.send(packet, '00:00:00:00:00:02')
+    interface.send(packet, '00:00:00:00:00:02')
+    interface.mac = '00:00:00:00:00:03'
+    interface.send(packet, '00:00:00:00:00:02')
+
+    frames = [scapy.all.Ether(data) for data in sent]
+    assert [frame.src for frame in frames] == [
+        '00:00:00:00:00:01', '00:00:00:00:00:01', '00:00:00:00:00:03']
+    for frame in frames:
+        assert frame.dst == '00:00:00:00:00:02'
+        assert bytes(frame[scapy.all.IP]) == bytes(packet)
+
+def test_router_local_ips():
+    interface = netscool.layer3.IPInterface(
+        'i0', '10.0.0.1/24', '00:00:00:00:00:01')
+    router = netscool.layer3.Router('r0', [interface])
+    assert router._local_ips == {netscool.layer3._ip_to_int('10.0.0.1')}
+
+    interface.ipv4 = ipaddress.IPv4Interface('10.0.0.2/24')
+    router.event_loop()
+    assert router._local_ips == {netscool.layer3._ip_to_int('10.0.0.2')}
+
+def test_routetable_routes_assigned():
+    routetable = netscool.layer3.RouteTable()
+    route = netscool.layer3.Route(
+        network=ipaddress.IPv4Network('10.0.0.0/8'), interface='dummy',
+        nexthop=None, ad=0, metric=0)
+    ip = ipaddress.IPv4Address('10.0.0.1')
+
+    # Assigning a new routes list should rebuild the index lookup uses.
+    assert routetable.lookup(ip) == None
+    routetable.routes = [route]
+    assert routetable.lookup(ip) == route
+    routetable.routes = []
+    assert routetable.lookup(ip) == None